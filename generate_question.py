@@ -3,6 +3,7 @@ import random
 import re
 from openai import OpenAI
 from dotenv import load_dotenv
+from verify_answer import verify_question
 
 load_dotenv()
 
@@ -124,11 +125,21 @@ def parse_gpt_output(raw):
         print(f"❌ Failed to parse GPT output: {e}")
         return random.choice(fallback_questions)
 
+def build_question(raw):
+    question = parse_gpt_output(raw)
+    if question in fallback_questions:
+        return question
+    verified = verify_question(question, raw)
+    if verified is None:
+        print("❌ GPT answer failed verification, using fallback question")
+        return random.choice(fallback_questions)
+    return verified
+
 def generate_question():
     try:
         raw = fetch_from_openai()
         print("\U0001F4E6 GPT raw response:\n", raw)
-        return parse_gpt_output(raw)
+        return build_question(raw)
     except Exception as e:
         print(f"❌ Error calling OpenAI: {e}")
         return random.choice(fallback_questions)
@@ -1,37 +1,35 @@
+import io
 import os
+import random
+import time
+import asyncio
+import argparse
 import importlib.util
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
 
 # Dynamic import
 spec = importlib.util.spec_from_file_location("generate_question", "generate_question.py")
 generate_question_module = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(generate_question_module)
-generate_question = generate_question_module.generate_question
+fetch_from_openai = generate_question_module.fetch_from_openai
+build_question = generate_question_module.build_question
+fallback_questions = generate_question_module.fallback_questions
 
-# Helper to determine day and post
+def next_day_post(day, post):
+    return (day, 2) if post == 1 else (day + 1, 1)
+
+# Helper to determine day and post: the slot after the latest slide written, so a gap is never refilled
 def determine_day_post(slide_dir):
     existing = [f for f in os.listdir(slide_dir) if f.endswith(".png")]
-    day_post_map = {}
+    written = []
     for f in existing:
         parts = f.replace(".png", "").split("_")
         if len(parts) == 4 and parts[0] == "day":
-            day = int(parts[1])
-            post = int(parts[3])
-            if day not in day_post_map:
-                day_post_map[day] = []
-            day_post_map[day].append(post)
-    if not day_post_map:
+            written.append((int(parts[1]), int(parts[3])))
+    if not written:
         return 1, 1
-    max_day = max(day_post_map.keys())
-    if len(day_post_map[max_day]) >= 2:
-        return max_day + 1, 1
-    else:
-        return max_day, 2
-
-day_number, post_number = determine_day_post("output/slides")
-
-question_data = generate_question()
-question_data["day"] = f"Day {day_number}"
+    return next_day_post(*max(written))
 
 # Paths
 bg_path = "assets/backgrounds/bg.png"
@@ -123,14 +121,27 @@ def paste_icon(draw, bg, icon_path, x, y, size=60):
         icon = Image.open(icon_path).resize((size, size)).convert("RGBA")
         bg.paste(icon, (x, y), icon)
 
-# Generate Question Slide
-def generate_question_slide(data):
-    os.makedirs("output/slides", exist_ok=True)
-    output_path = f"output/slides/day_{day_number}_post_{post_number}.png"
-
+# Layout: wrap text and size the cards
+def layout_question_slide(data):
     q_lines = wrap_lines(preprocess_code(data["question"]), code_font, 900)
     o_lines = [l for opt in data["options"] for l in wrap_lines([opt], code_font, 900)]
-    card_height = get_card_height(q_lines, o_lines)
+    return {"q_lines": q_lines, "o_lines": o_lines, "card_height": get_card_height(q_lines, o_lines)}
+
+def layout_answer_slide(data):
+    q_lines = wrap_lines(preprocess_code(data["question"]), code_font, 900)
+    full_answer = next((opt for opt in data["options"] if opt.startswith(data["answer"])), data["answer"])
+    answer_lines = wrap_lines([f"Answer: {full_answer}"], answer_font, 900)
+    explanation_lines = wrap_lines([data["explanation"]], code_font, 900)
+    return {
+        "q_lines": q_lines,
+        "answer_lines": answer_lines,
+        "explanation_lines": explanation_lines,
+        "card_height": get_card_height(q_lines, answer_lines, explanation_lines)
+    }
+
+# Draw Question Slide
+def render_question_slide(data, layout):
+    card_height = layout["card_height"]
 
     bg = Image.new("RGB", (1080, 1920), "white")
     draw = ImageDraw.Draw(bg)
@@ -152,12 +163,12 @@ def generate_question_slide(data):
     cd.line((cx, cy, card_x + 950, cy), fill="white", width=2)
     cy += 40
 
-    for line in q_lines:
+    for line in layout["q_lines"]:
         cd.text((cx, cy), line, font=code_font, fill="white")
         cy += 60
 
     cy += 30
-    for line in o_lines:
+    for line in layout["o_lines"]:
         cd.text((cx, cy), line, font=code_font, fill="white")
         cy += 60
 
@@ -169,21 +180,11 @@ def generate_question_slide(data):
     draw.text((swipe_x, swipe_y), swipe_text, font=swipe_font, fill="#1f2937")
     paste_icon(draw, bg, arrow_path, int(swipe_x + swipe_width + 20), int(swipe_y + 10))
 
-    bg.save(output_path)
-    print(f"✅ Question slide saved to: {output_path}")
-    return card_height
+    return bg
 
-# Generate Answer Slide
-def generate_answer_slide(data, card_height):
-    os.makedirs("output/answers", exist_ok=True)
-    output_path = f"output/answers/day_{day_number}_post_{post_number}_answer.png"
-
-    q_lines = wrap_lines(preprocess_code(data["question"]), code_font, 900)
-    full_answer = next((opt for opt in data["options"] if opt.startswith(data["answer"])), data["answer"])
-    answer_lines = wrap_lines([f"Answer: {full_answer}"], answer_font, 900)
-    explanation_lines = wrap_lines([data["explanation"]], code_font, 900)
-
-    card_height = get_card_height(q_lines, answer_lines, explanation_lines)
+# Draw Answer Slide
+def render_answer_slide(data, layout):
+    card_height = layout["card_height"]
 
     bg = Image.new("RGB", (1080, 1920), "white")
     draw = ImageDraw.Draw(bg)
@@ -205,17 +206,17 @@ def generate_answer_slide(data, card_height):
     cd.line((cx, cy, card_x + 950, cy), fill="white", width=2)
     cy += 40
 
-    for line in q_lines:
+    for line in layout["q_lines"]:
         cd.text((cx, cy), line, font=code_font, fill="white")
         cy += 60
 
     cy += 20
-    for line in answer_lines:
+    for line in layout["answer_lines"]:
         cd.text((cx, cy), line, font=answer_font, fill="#22c55e")
         cy += 60
 
     cy += 10
-    for line in explanation_lines:
+    for line in layout["explanation_lines"]:
         cd.text((cx, cy), line, font=code_font, fill="white")
         cy += 60
 
@@ -237,9 +238,217 @@ def generate_answer_slide(data, card_height):
         draw.text((text_x, footer_y), text, font=footer_font, fill="#1f2937")
         footer_y += 90
 
-    bg.save(output_path)
+    return bg
+
+# Pipeline stages: each takes a post dict and returns it with one more step done
+def fetch_stage(post):
+    try:
+        raw = fetch_from_openai()
+        print("\U0001F4E6 GPT raw response:\n", raw)
+    except Exception as e:
+        print(f"❌ Error calling OpenAI: {e}")
+        raw = None
+    return dict(post, raw=raw)
+
+def verify_stage(post):
+    data = build_question(post["raw"]) if post["raw"] is not None else random.choice(fallback_questions)
+    data = dict(data, day=f"Day {post['day_number']}")
+    return dict(post, data=data)
+
+def fallback_stage(post):
+    data = dict(random.choice(fallback_questions), day=f"Day {post['day_number']}")
+    return dict(post, data=data)
+
+def layout_stage(post):
+    data = post["data"]
+    return dict(post, question_layout=layout_question_slide(data), answer_layout=layout_answer_slide(data))
+
+def encode_png(img):
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+# Encode here so only compressed PNG bytes travel back from the process pool
+def rasterize_stage(post):
+    data = post["data"]
+    question_png = encode_png(render_question_slide(data, post["question_layout"]))
+    answer_png = encode_png(render_answer_slide(data, post["answer_layout"]))
+    return dict(post, question_png=question_png, answer_png=answer_png)
+
+def write_stage(post):
+    os.makedirs("output/slides", exist_ok=True)
+    os.makedirs("output/answers", exist_ok=True)
+    day_number, post_number = post["day_number"], post["post_number"]
+
+    output_path = f"output/slides/day_{day_number}_post_{post_number}.png"
+    with open(output_path, "wb") as f:
+        f.write(post["question_png"])
+    print(f"✅ Question slide saved to: {output_path}")
+
+    output_path = f"output/answers/day_{day_number}_post_{post_number}_answer.png"
+    with open(output_path, "wb") as f:
+        f.write(post["answer_png"])
     print(f"✅ Explanation slide saved to: {output_path}")
+    return post
+
+def run_steps(steps, post):
+    for step in steps:
+        post = step(post)
+    return post
+
+SENTINEL = None
+
+class Stage:
+    """One pipeline step: a bounded inbox drained by `workers` concurrent workers.
+
+    Stage functions run in the stage's own `executor`, sized to `workers`.
+    A post that fails is redone through `recover` (steps starting from a
+    fallback question) so its day/post slot still gets written.
+    """
+
+    def __init__(self, name, func, workers, executor, queue_size=2, recover=None):
+        self.name = name
+        self.func = func
+        self.recover = recover
+        self.workers = workers
+        self.executor = executor
+        self.inbox = asyncio.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.failed = 0
+        self.recovered = 0
+        self.busy = 0.0
+        self.max_depth = 0
+        self.depth_total = 0
+        self.depth_samples = 0
+
+    async def put(self, post):
+        # Blocks while the inbox is full, which is what pushes back on upstream stages
+        await self.inbox.put(post)
+        depth = self.inbox.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self.depth_total += depth
+        self.depth_samples += 1
+
+    async def call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def process(self, post):
+        try:
+            return await self.call(self.func, post)
+        except Exception as e:
+            print(f"❌ {self.name} failed for day {post['day_number']} post {post['post_number']}: {e}")
+            if not self.recover:
+                raise
+        post = await self.call(run_steps, self.recover, post)
+        self.recovered += 1
+        print(f"🔧 Used a fallback question for day {post['day_number']} post {post['post_number']}")
+        return post
+
+    async def worker(self, downstream):
+        while True:
+            post = await self.inbox.get()
+            if post is SENTINEL:
+                return
+            started = time.perf_counter()
+            try:
+                post = await self.process(post)
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Dropped day {post['day_number']} post {post['post_number']} in {self.name}: {e}")
+                continue
+            finally:
+                self.busy += time.perf_counter() - started
+            self.processed += 1
+            if downstream is not None:
+                await downstream.put(post)
+
+    async def run(self, downstream):
+        await asyncio.gather(*(self.worker(downstream) for _ in range(self.workers)))
+        if downstream is not None:
+            for _ in range(downstream.workers):
+                await downstream.inbox.put(SENTINEL)
+
+    def stats(self):
+        avg_depth = self.depth_total / self.depth_samples if self.depth_samples else 0
+        return (
+            f"{self.name:<10} workers={self.workers} processed={self.processed} recovered={self.recovered} failed={self.failed} "
+            f"busy={self.busy:.2f}s avg_depth={avg_depth:.1f} max_depth={self.max_depth}"
+        )
+
+async def feed(first, posts):
+    for post in posts:
+        await first.put(post)
+    for _ in range(first.workers):
+        await first.inbox.put(SENTINEL)
+
+async def run_pipeline(posts, args):
+    cpu_pool = ProcessPoolExecutor if args.rasterize_executor == "process" else ThreadPoolExecutor
+    # Fetch gets its own pool too: the loop's default executor would silently cap --fetch-workers
+    executors = [
+        ThreadPoolExecutor(max_workers=args.fetch_workers),
+        ThreadPoolExecutor(max_workers=args.verify_workers),
+        ThreadPoolExecutor(max_workers=args.layout_workers),
+        cpu_pool(max_workers=args.rasterize_workers),
+        ThreadPoolExecutor(max_workers=args.write_workers)
+    ]
+    stages = [
+        Stage("fetch", fetch_stage, args.fetch_workers, executors[0], args.queue_size),
+        Stage("verify", verify_stage, args.verify_workers, executors[1], args.queue_size,
+              recover=[fallback_stage]),
+        Stage("layout", layout_stage, args.layout_workers, executors[2], args.queue_size,
+              recover=[fallback_stage, layout_stage]),
+        Stage("rasterize", rasterize_stage, args.rasterize_workers, executors[3], args.queue_size,
+              recover=[fallback_stage, layout_stage, rasterize_stage]),
+        Stage("write", write_stage, args.write_workers, executors[4], args.queue_size)
+    ]
+
+    started = time.perf_counter()
+    try:
+        downstreams = stages[1:] + [None]
+        await asyncio.gather(
+            feed(stages[0], posts),
+            *(stage.run(downstream) for stage, downstream in zip(stages, downstreams))
+        )
+    finally:
+        for executor in executors:
+            executor.shutdown()
+    elapsed = time.perf_counter() - started
+
+    print("\n📊 Pipeline stats:")
+    for stage in stages:
+        print(stage.stats())
+    written = stages[-1].processed
+    print(f"{written} post(s) in {elapsed:.2f}s ({written / elapsed:.2f} posts/s)")
+
+# A queue size of 0 would make asyncio.Queue unbounded and 0 workers would hang the pipeline
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate question and answer slides")
+    parser.add_argument("--count", type=positive_int, default=1, help="number of posts to generate")
+    parser.add_argument("--queue-size", type=positive_int, default=2, help="max posts waiting between stages")
+    parser.add_argument("--fetch-workers", type=positive_int, default=4, help="concurrent OpenAI requests")
+    parser.add_argument("--verify-workers", type=positive_int, default=2)
+    parser.add_argument("--layout-workers", type=positive_int, default=1)
+    parser.add_argument("--rasterize-workers", type=positive_int, default=os.cpu_count() or 1)
+    parser.add_argument("--rasterize-executor", choices=["process", "thread"], default="process")
+    parser.add_argument("--write-workers", type=positive_int, default=2)
+    return parser.parse_args()
 
 # Main
-card_height = generate_question_slide(question_data)
-generate_answer_slide(question_data, card_height)
+if __name__ == "__main__":
+    args = parse_args()
+    os.makedirs("output/slides", exist_ok=True)
+    day_number, post_number = determine_day_post("output/slides")
+
+    posts = []
+    for _ in range(args.count):
+        posts.append({"day_number": day_number, "post_number": post_number})
+        day_number, post_number = next_day_post(day_number, post_number)
+
+    asyncio.run(run_pipeline(posts, args))
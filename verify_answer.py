@@ -0,0 +1,272 @@
+import ast
+import atexit
+import json
+import os
+import queue
+import re
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+
+# Sandbox settings
+POOL_SIZE = int(os.getenv("VERIFY_POOL_SIZE", "2"))
+RUN_TIMEOUT = float(os.getenv("VERIFY_TIMEOUT", "2.0"))
+MEMORY_LIMIT = 256 * 1024 * 1024
+CPU_LIMIT = 5
+MAX_OUTPUT = 4000
+
+# Each warm worker limits itself, waits for one JSON request, replies once and exits
+WORKER_SOURCE = r'''
+import io, json, sys
+try:
+    import resource
+    limits = [(resource.RLIMIT_CPU, %d), (resource.RLIMIT_AS, %d), (resource.RLIMIT_FSIZE, 0), (resource.RLIMIT_NPROC, 0)]
+    for kind, value in limits:
+        try:
+            resource.setrlimit(kind, (value, value))
+        except (ValueError, OSError):
+            pass
+except ImportError:
+    pass
+channel_in, channel_out = sys.stdin, sys.stdout
+request = channel_in.readline()
+if not request:
+    sys.exit()
+captured = io.StringIO()
+sys.stdin, sys.stdout, sys.stderr = io.StringIO(), captured, io.StringIO()
+error = None
+sandboxed = False
+try:
+    exec(compile(json.loads(request)["code"], "<question>", "exec"), {"__name__": "__main__"})
+except BaseException as e:
+    error = type(e).__name__
+    # Failures the sandbox itself causes: no files, no stdin, no extra processes, capped memory
+    sandboxed = isinstance(e, (OSError, EOFError, MemoryError, ImportError))
+reply = {"stdout": captured.getvalue()[:%d], "error": error, "sandboxed": sandboxed}
+channel_out.write(json.dumps(reply) + "\n")
+channel_out.flush()
+''' % (CPU_LIMIT, MEMORY_LIMIT, MAX_OUTPUT)
+
+OPTION_PATTERN = r"^[ABCD][\.\)]\s?"
+SANDBOX_ERRORS = (TimeoutError, RuntimeError, OSError, ValueError, queue.Empty)
+
+idle_workers = None
+workdir = None
+pool_lock = threading.Lock()
+
+def spawn_worker():
+    return subprocess.Popen(
+        [sys.executable, "-I", "-B", "-u", "-c", WORKER_SOURCE],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        cwd=workdir,
+        env={"PATH": os.environ.get("PATH", "")},
+        start_new_session=True,
+        text=True,
+    )
+
+# Kill the worker's whole session so nothing the snippet started outlives it
+def retire_worker(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    proc.wait()
+    proc.stdin.close()
+    proc.stdout.close()
+
+def stop_pool():
+    while idle_workers is not None and not idle_workers.empty():
+        retire_worker(idle_workers.get_nowait())
+    if workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def start_pool(size=POOL_SIZE):
+    global idle_workers, workdir
+    with pool_lock:
+        if idle_workers is None:
+            workdir = tempfile.mkdtemp(prefix="verify_")
+            workers = queue.Queue()
+            for _ in range(size):
+                workers.put(spawn_worker())
+            idle_workers = workers
+            atexit.register(stop_pool)
+        return idle_workers
+
+# Workers are single use so every snippet gets a clean interpreter; the replacement boots while idle
+def run_code(code):
+    workers = start_pool()
+    proc = workers.get(timeout=RUN_TIMEOUT)
+    try:
+        proc.stdin.write(json.dumps({"code": code}) + "\n")
+        proc.stdin.flush()
+        ready, _, _ = select.select([proc.stdout], [], [], RUN_TIMEOUT)
+        if not ready:
+            raise TimeoutError(f"Question code ran longer than {RUN_TIMEOUT}s")
+        reply = proc.stdout.readline()
+        if not reply:
+            raise RuntimeError("Sandbox worker exited while running question code")
+        return json.loads(reply)
+    finally:
+        retire_worker(proc)
+        workers.put(spawn_worker())
+
+def compiles(code):
+    try:
+        compile(code, "<question>", "exec")
+        return True
+    except SyntaxError:
+        return False
+
+# Code block of the raw GPT response, which still has its indentation
+def question_section(raw):
+    section = []
+    started = False
+    for line in raw.split("\n"):
+        # Tolerate markdown headings like "**Question:**" or "### Options"
+        stripped = line.strip().strip("*#_ ")
+        if not started:
+            started = stripped.lower().startswith("question")
+            continue
+        if stripped.lower().startswith(("options", "answer", "explanation")) or re.match(OPTION_PATTERN + ".+", stripped):
+            break
+        section.append(line)
+    return "\n".join(section) if started else None
+
+def looks_like_code(line):
+    stripped = line.strip()
+    return compiles(stripped) or compiles(stripped + "\n    pass") or stripped.endswith(("(", "[", "{", "\\"))
+
+def extract_code(text):
+    # Skip leading prose ("What is the output of the following Python code?"), then take everything
+    # from the first code line; a trailing fragment that happens to compile is never used
+    lines = text.split("\n")
+    start = next((i for i, line in enumerate(lines) if line.strip() and looks_like_code(line)), None)
+    if start is None:
+        return None
+    code = textwrap.dedent("\n".join(lines[start:])).strip("\n")
+    return code if compiles(code) else None
+
+def option_text(option):
+    return re.sub(OPTION_PATTERN, "", option.strip()).strip()
+
+def unquote(text):
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    return text
+
+def squash(text):
+    text = re.sub(r"\s*([,:\[\](){}])\s*", r"\1", text.strip())
+    return " ".join(text.split())
+
+def same_output(expected, actual):
+    try:
+        expected_value, actual_value = ast.literal_eval(expected), ast.literal_eval(actual)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return squash(expected) == squash(actual)
+    # A printed string's quotes are real characters, so 'hi' and "hi" must match exactly
+    if isinstance(expected_value, str) or isinstance(actual_value, str):
+        return squash(expected) == squash(actual)
+    # repr keeps 1 and 1.0 or True and 1 apart
+    return repr(expected_value) == repr(actual_value)
+
+# Quotes are usually just presentation ("HELLO" for print("HELLO")), unless they are what tells two options apart
+def option_forms(option, options):
+    text = option_text(option)
+    bare = unquote(text)
+    if bare == text:
+        return [text]
+    for other in options:
+        other_text = option_text(other)
+        if other_text != text and unquote(other_text) == bare:
+            return [text]
+    return [text, bare]
+
+def mentions_error(option):
+    return re.search(r"error|exception", option_text(option), re.IGNORECASE) is not None
+
+def looks_like_output(option):
+    text = option_text(option)
+    if mentions_error(option) or not re.search(r"\s", text):
+        return True
+    if text[:1] in "\"'[{(<" or re.match(r"^[\w.]+\(.*\)$", text):
+        return True
+    try:
+        ast.literal_eval(text)
+        return True
+    except (ValueError, SyntaxError):
+        return False
+
+def names_exception(option, name):
+    return re.search(r"\b%s\b" % re.escape(name), option_text(option), re.IGNORECASE) is not None
+
+def matching_options(options, result):
+    if result["error"]:
+        # Only options naming the exception count, a bare "Error" proves nothing
+        return [opt[0] for opt in options if names_exception(opt, result["error"])]
+    output = result["stdout"].strip()
+    return [opt[0] for opt in options if any(same_output(form, output) for form in option_forms(opt, options))]
+
+def verify_question(data, raw=None):
+    """Run the question's code and check the answer letter against real output.
+
+    Returns the question (with the answer repaired if needed), or None when the
+    code's output conclusively matches none of the options.
+    """
+    # parse_gpt_output strips indentation from data["question"], so only the raw response is trusted
+    section = question_section(raw) if raw else None
+    code = extract_code(section) if section else None
+    if code is None:
+        print("⚠️ No runnable code found, skipping answer verification")
+        return data
+
+    started = time.perf_counter()
+    try:
+        result = run_code(code)
+    except SANDBOX_ERRORS as e:
+        print(f"⚠️ Could not verify answer: {str(e) or type(e).__name__}")
+        return data
+    elapsed = (time.perf_counter() - started) * 1000
+
+    # Code that prints nothing (e.g. "what is x after..."), fails only because of the sandbox,
+    # or raises an exception no option names can't be checked this way
+    if result["error"]:
+        conclusive = not result["sandboxed"] and any(names_exception(opt, result["error"]) for opt in data["options"])
+    else:
+        conclusive = result["stdout"].strip() and any(looks_like_output(opt) for opt in data["options"])
+    if not conclusive:
+        print(f"⚠️ Output is inconclusive, leaving answer {data['answer']} unverified ({elapsed:.1f} ms)")
+        return data
+
+    matches = matching_options(data["options"], result)
+    actual = result["error"] or result["stdout"].strip()
+    if not matches:
+        print(f"❌ No option matches actual output {actual!r} ({elapsed:.1f} ms)")
+        return None
+    if data["answer"] in matches:
+        print(f"✅ Answer {data['answer']} verified ({elapsed:.1f} ms)")
+        return data
+    if len(matches) > 1:
+        print(f"❌ Ambiguous options {matches} match actual output {actual!r} ({elapsed:.1f} ms)")
+        return None
+    print(f"🔧 Repaired answer {data['answer']} -> {matches[0]} ({elapsed:.1f} ms)")
+    return dict(data, answer=matches[0])
+
+if __name__ == "__main__":
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location("generate_question", "generate_question.py")
+    generate_question_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(generate_question_module)
+
+    print("⚡ Verifying fallback questions...")
+    for question in generate_question_module.fallback_questions:
+        # Fallback questions keep their indentation, so the text can stand in for a raw response
+        verify_question(question, "Question:\n" + question["question"])